@@ -49,32 +49,60 @@
 # This cell performs the following steps:
 # 
 # 1. **Import Libraries**:
+#    - `heapq` is imported from the standard library for the priority queue used by the streaming tracker.
 #    - `numpy` is imported as `np` for numerical operations.
 #    - `matplotlib.pyplot` is imported as `plt` for data visualization (to be used later).
+#    - `display` is imported from `IPython.display` to render a figure that is reused across several plots.
+#    - `gaussian_kde` is imported from `scipy.stats` to estimate smooth PDFs of the waiting times.
+#    - `numba.njit` and `numba.prange` are imported if Numba is installed to compile and parallelize the waiting time kernel. `NUMBA_AVAILABLE` records whether the import succeeded, so the analysis still runs without Numba.
+#    - Without Numba, `pyximport` compiles and imports the Cython kernel in `waiting_kernel.pyx` (next to this notebook) on first use. `CYTHON_AVAILABLE` records whether this succeeded. The `.pyx` import hook that `pyximport.install` adds is removed with `pyximport.uninstall` right after the import, so it does not stay active for the rest of the session. It requires Cython and a C compiler; if neither compiled kernel is available, a pure `numpy` implementation is used.
 # 
 # 2. **Define File Path**:
 #    - The file path to the gold price data (`Gold_TimeWindow_1min.txt`) is specified. This file contains time-series data for gold prices sampled at 1-minute intervals.
 # 
 # 3. **Read and Process File**:
-#    - The file is opened and read line by line using the `with open` statement for efficient file handling.
-#    - Each line is processed to extract the gold price (assumed to be the first value in each line). These prices are converted to floating-point numbers and stored in a list.
+#    - The file is parsed with `np.loadtxt`, which reads the gold price (assumed to be the first value in each line, selected with `usecols=(0,)`) directly into a `numpy` array of floating-point numbers.
+#    - No intermediate Python list of lines or floats is built, which keeps loading fast and memory-light for large files.
 # 
-# 4. **Convert Prices to Numpy Array**:
-#    - The list of prices is converted to a `numpy` array for optimized numerical computations.
+# 4. **Define Tick Size**:
+#    - `tick_size` is the price resolution of the data (`0.01`, one cent). The waiting time functions use it to convert prices and increments to whole numbers of ticks. Adjust it for data with a different resolution; prices that are not whole multiples of it are rejected.
 # 
-# **Output**: The `prices` variable contains an array of gold prices sampled at 1-minute intervals.
+# **Output**: The `prices` variable contains an array of gold prices sampled at 1-minute intervals, and `tick_size` holds their resolution.
 
 # %%
+import heapq
+
 import numpy as np
 import matplotlib.pyplot as plt
+from IPython.display import display
+from scipy.stats import gaussian_kde
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Without Numba, fall back to the Cython kernel in waiting_kernel.pyx (compiled on first import)
+CYTHON_AVAILABLE = False
+if not NUMBA_AVAILABLE:
+    try:
+        import pyximport
+        pyx_importers = pyximport.install(language_level=3)
+        try:
+            import waiting_kernel
+            CYTHON_AVAILABLE = True
+        finally:
+            # Only waiting_kernel is built this way, so the .pyx import hook is removed again
+            pyximport.uninstall(*pyx_importers)
+    except ImportError:
+        pass
 
 file_path = r"YOUR FILE PATH"
 
-with open(file_path, 'r') as file:
-    lines = file.readlines()
+prices = np.loadtxt(file_path, usecols=(0,), dtype=np.float64, ndmin=1)
 
-prices = [float(line.split()[0]) for line in lines]
-prices = np.array(prices)
+tick_size = 0.01  # Price resolution of the data (one cent)
 
 # %% [markdown]
 # ### Generalized Function to Calculate Waiting Times for Price Increases and Decreases
@@ -88,76 +116,312 @@ prices = np.array(prices)
 # - **Parameters**:
 #   1. `data`: A `numpy` array containing the gold price time-series data.
 #   2. `increments`: A list of positive values (e.g., `[5, 10, 20]`) representing the price increments to check.
+#   3. `tick_size` (optional): The price resolution (e.g., `0.01`). If given, prices and increments are converted to `int32` tick counts by `quantize_prices` before any comparison. `quantize_prices` raises a `ValueError` instead of silently rounding when the data has a finer resolution than `tick_size`, when an increment is smaller than one tick, or when the prices do not fit in `int32` ticks.
 # 
 # - **Returns**:
 #   A dictionary with:
 #   - Keys: Tuples in the form `(increment, direction)`, where `direction` is either `"increase"` or `"decrease"`.
-#   - Values: `numpy` arrays containing the waiting times for each increment and direction.
+#   - Values: `float32` `numpy` arrays containing the waiting times for each increment and direction.
+# 
+# - The dictionary is a convenient view on `calculate_waiting_times_array`, which returns all waiting times as a single `float32` array of shape `(N, K, 2)`: `[:, k, 0]` for an increase by `increments[k]` and `[:, k, 1]` for a decrease. It is stored with the time index innermost and returned as a transposed view, so every dictionary value is a contiguous array, and the plotting cells read it without strides.
 # 
 # #### Logic:
-# 1. **Loop Over Increments**:
-#    - For each increment in the provided list, calculate waiting times for both price increases and decreases.
+# 1. **Handle All Increments Per Direction**:
+#    - Everything that does not depend on the increment (the window table of the `numpy` path) is built once per direction.
+#    - The waiting times for all increments are then calculated for both price increases and decreases.
 # 
 # 2. **Waiting Times for Price Increase**:
-#    - For each price point in the dataset:
-#      - Determine the target price as the current price plus the increment.
-#      - Check subsequent prices (`data[i:]`) to see if the target price is reached.
+#    - The target price for index `i` is the current price plus the increment, and the waiting time is the distance to the first later index whose price reaches it.
+#    - `calculate_waiting_times_one_direction` finds these first hits for all indices at once with `numpy`, without any Python loop over the data:
+#      - A doubling table built by `build_window_max_table` holds, for every `k`, the maximum price in each window `data[p:p + 2**k]`.
+#      - Every index starts just after `i` and jumps ahead by `2**k` (largest `k` first) whenever the window it would skip stays below the target. After about `log2(N)` vectorized steps each index sits on its first hit.
+#      - Each step is a single gather, compare and masked add (`np.add(..., where=skip)`) into preallocated buffers. Indices that run past the end of the data read a `-inf` sentinel and simply keep moving, so no clamping pass is needed.
 #      - If reached, calculate the waiting time as the index difference. If not, set the waiting time to `infinity`.
 # 
 # 3. **Waiting Times for Price Decrease**:
-#    - Repeat the same process as above, but calculate the target price as the current price minus the increment.
+#    - Repeat the same process as above on the negated prices, which turns window maxima into window minima, and calculate the target price as the current price minus the increment.
 # 
-# 4. **Store Results**:
+# 4. **Compiled Kernel (Numba)**:
+#    - When Numba is installed, `_waiting_times_dir` is used instead. It sweeps the prices from right to left and keeps a monotonic stack of the upcoming strict records (each one higher, or lower, than every price before it).
+#      - The first index that reaches the target price is always one of these records, so a binary search on the stack finds it in `O(log N)` steps.
+#      - The sweep carries the stack from one index to the next, so it is inherently sequential. The increments are independent of each other, so each one runs its own sweep in parallel with `prange` (`@njit(parallel=True)`).
+#    - The `sign` argument selects the direction (`+1` for increase, `-1` for decrease), so the same kernel serves both.
+# 
+# 5. **Compiled Kernel (Cython)**:
+#    - Without Numba, the same sweep is taken from the Cython module `waiting_kernel.pyx`. It runs as plain C loops over typed memoryviews with bounds checking disabled, one increment after the other.
+# 
+# 6. **Store Results**:
 #    - Save the computed waiting times for both increase and decrease in the results dictionary under the corresponding key.
 # 
 # #### Notes:
-# - The function is optimized using `numpy` for element-wise comparisons and logical operations.
+# - Both paths cost `O(N log N)` per increment, for floats and ticks alike, instead of the `O(N²)` of scanning `data[i:]` for every index.
 # - Waiting times are set to `infinity` if the target condition is not met within the dataset.
-# - This function is flexible and can handle multiple increments simultaneously.
+# - The prices must be finite: NaN has no order, so it would silently break both the window table and the stack sweep. A `ValueError` is raised instead, and missing prices have to be removed or filled before the analysis.
+# - With `tick_size`, all paths compare integers. This is exact: in floating point, `price + increment` can be rounded slightly above the stored target price, so a price that exactly reaches the target is missed. For example, `1014.07 + 10` gives `1024.0700000000002`, which is above `1024.07`. These misses are rare and cluster in narrow bands where the sum crosses a power of two (such as $1024); for increments of 5, 10 and 20 there are none between $1800 and $1822, but a dataset that spans such a band is affected. The kernels are specialized for the type of the prices (Numba compiles one version per type, and the Cython module uses a fused type), and the `numpy` table uses the smallest `int32` instead of `-inf` as its sentinel.
+# - Waiting times are stored as `float32`, which represents every whole number of minutes up to `2**24` (about 32 years of data) exactly while halving the memory moved by the plotting cells.
+# - This function is flexible and can handle multiple increments simultaneously. The Numba kernel sweeps them in parallel; the `numpy` path is limited by memory gathers, so it handles them one at a time on the shared table.
 # 
-# **Output**: A dictionary containing waiting times for both increases and decreases for all specified increments.
+# #### Function Definition: `calculate_waiting_time_counts`
+# - **Purpose**:
+#   The histograms and PDFs only need the distribution of the waiting times. This function turns the waiting times of `calculate_waiting_times_both_directions` into per-minute counts with `np.bincount`.
+# 
+# - **Returns**:
+#   A dictionary with the same keys as `waiting_times_dict`, whose values are tuples `(counts, never_reached)`: `counts[w]` is the number of indices with a waiting time of `w` minutes, and `never_reached` is the number of indices whose target price is never reached.
+# 
+# - The counts are built from the arrays that are already in memory, so the waiting times are not computed a second time. The plotting cells then work on one count per distinct waiting time instead of one value per index.
+# 
+# **Output**: A dictionary containing waiting times for both increases and decreases for all specified increments, and a dictionary of their counts.
 
 # %%
+# Prices as whole numbers of ticks, so every comparison below is an exact integer compare
+def quantize_prices(data, increments, tick_size):
+    """
+    Convert prices and increments to integer multiples of the tick size.
+
+    Parameters:
+    - data: numpy array of prices.
+    - increments: list of positive increments (e.g., [5, 10, 20]).
+    - tick_size: price resolution of the data (e.g., 0.01).
+
+    Returns:
+    - ticks: int32 numpy array of the prices in ticks.
+    - increment_ticks: int32 numpy array of the increments in ticks.
+
+    Raises:
+    - ValueError: if the prices or increments are not whole multiples of tick_size, if an increment is
+      smaller than one tick, or if the prices plus or minus the increments do not fit in int32.
+    """
+    scaled_data = np.asarray(data, dtype=np.float64) / tick_size
+    scaled_increments = np.asarray(increments, dtype=np.float64) / tick_size
+    ticks = np.rint(scaled_data)
+    increment_ticks = np.rint(scaled_increments)
+
+    # Rounding must only undo floating-point error, never change a price or an increment
+    # (a tolerance of a thousandth of a tick also rejects NaN)
+    if not np.allclose(ticks, scaled_data, rtol=0, atol=1e-3):
+        raise ValueError(f"prices are not whole multiples of tick_size={tick_size}")
+    if not np.allclose(increment_ticks, scaled_increments, rtol=0, atol=1e-3):
+        raise ValueError(f"increments are not whole multiples of tick_size={tick_size}")
+    if np.any(increment_ticks < 1):
+        raise ValueError(f"increments must be at least one tick (tick_size={tick_size})")
+
+    # Targets up to one increment above or below every price (and the negated prices) must stay in int32
+    limit = np.iinfo(np.int32).max
+    if np.max(np.abs(ticks), initial=0) + np.max(increment_ticks, initial=0) > limit:
+        raise ValueError(f"prices do not fit in int32 ticks of tick_size={tick_size}")
+
+    return ticks.astype(np.int32), increment_ticks.astype(np.int32)
+
+
+# Doubling table of window maxima, shared by all increments of one direction
+def build_window_max_table(data, direction):
+    """
+    Build the table of window maxima used by calculate_waiting_times_one_direction.
+
+    Parameters:
+    - data: numpy array of prices, either integer ticks or floating-point.
+    - direction: "increase" or "decrease" (the prices are negated for "decrease").
+
+    Returns:
+    - A 2D numpy array where row k, column p holds the maximum of the (signed) prices in data[p:p + 2**k].
+      Column len(data) is a sentinel below every price (-inf, or the smallest integer for ticks).
+    """
+    n = len(data)
+    keys = np.asarray(data)
+    if np.issubdtype(keys.dtype, np.integer):
+        sentinel = np.iinfo(keys.dtype).min
+    else:
+        keys = keys.astype(np.float64, copy=False)
+        sentinel = -np.inf
+    levels = max(1, int(np.ceil(np.log2(max(n, 1)))) + 1)
+    window_max = np.full((levels, n + 1), sentinel, dtype=keys.dtype)
+    window_max[0, :n] = keys if direction == "increase" else -keys
+    for k in range(1, levels):
+        # Windows that run past the end only see the sentinel in their second half
+        half = 2 ** (k - 1)
+        window_max[k] = window_max[k - 1]
+        if half <= n:
+            np.maximum(window_max[k - 1, :n + 1 - half], window_max[k - 1, half:], out=window_max[k, :n + 1 - half])
+    return window_max
+
+
+# Vectorized waiting times for a single increment and direction
+def calculate_waiting_times_one_direction(data, increment, direction, window_max=None):
+    """
+    Calculate waiting times for a single increment and direction using numpy only.
+
+    Parameters:
+    - data: numpy array of prices, either integer ticks or floating-point.
+    - increment: positive price increment (e.g., 10), in the same units as data.
+    - direction: "increase" or "decrease".
+    - window_max: optional table from build_window_max_table for the same data and direction.
+
+    Returns:
+    - A float32 numpy array of waiting times, with np.inf where the target price is never reached.
+    """
+    n = len(data)
+    targets = data + increment if direction == "increase" else -(data - increment)
+    if window_max is None:
+        window_max = build_window_max_table(data, direction)
+
+    # Jump over every window that stays below the target, largest windows first
+    # The scratch buffers are allocated once and reused by every level
+    # Positions past the end read the sentinel (mode='clip'), so they keep moving and never need clamping
+    positions = np.arange(1, n + 1)
+    window_values = np.empty(n, dtype=window_max.dtype)
+    skip = np.empty(n, dtype=bool)
+    for k in range(window_max.shape[0] - 1, -1, -1):
+        np.take(window_max[k], positions, out=window_values, mode='clip')
+        np.less(window_values, targets, out=skip)
+        np.add(positions, 2 ** k, out=positions, where=skip)
+
+    waiting_times = np.subtract(positions, np.arange(n), dtype=np.float32)
+    waiting_times[positions >= n] = np.inf
+    return waiting_times
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _waiting_times_dir(data, incs, sign):
+        """
+        Compiled monotonic-stack sweep for a single direction and several increments, parallel over the increments.
+
+        Parameters:
+        - data: numpy array of prices (int32 ticks or float64).
+        - incs: numpy array of positive price increments, of the same dtype as data.
+        - sign: 1 for "increase", -1 for "decrease", of the same type as data.
+
+        Returns:
+        - A float32 numpy array of shape (len(incs), len(data)) of waiting times,
+          with np.inf where the target price is never reached.
+        """
+        n = data.shape[0]
+        num_incs = incs.shape[0]
+        out = np.full((num_incs, n), np.inf, dtype=np.float32)
+
+        # Every increment runs its own sweep and only writes its own row out[k], so the loop is race-free
+        for k in prange(num_incs):
+            stack_prices = np.empty(n, dtype=data.dtype)
+            stack_indices = np.empty(n, dtype=np.int64)
+            top = 0
+
+            for i in range(n - 1, -1, -1):
+                # The stack holds the strict records after i, nearest on top, so the (signed) prices rise towards the bottom
+                # Binary search for the entry closest to the top that reaches the target price
+                target = sign * (data[i] + sign * incs[k])
+                lo = 0
+                hi = top
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if stack_prices[mid] >= target:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                if lo > 0:
+                    out[k, i] = stack_indices[lo - 1] - i
+
+                price = sign * data[i]
+                while top > 0 and stack_prices[top - 1] <= price:
+                    top -= 1
+                stack_prices[top] = price
+                stack_indices[top] = i
+                top += 1
+
+        return out
+
+elif CYTHON_AVAILABLE:
+    # Same kernel, compiled from waiting_kernel.pyx
+    _waiting_times_dir = waiting_kernel.waiting_times_dir
+
+
+# Waiting times for all increments and both directions as a single array
+def calculate_waiting_times_array(data, increments, tick_size=None):
+    """
+    Calculate waiting times for both increase and decrease for a list of increments as a single array.
+
+    Parameters:
+    - data: numpy array of prices.
+    - increments: list of positive increments (e.g., [5, 10, 20]).
+    - tick_size: optional price resolution (e.g., 0.01). If given, prices and increments are compared as int32 tick counts.
+
+    Returns:
+    - A float32 numpy array of shape (len(data), len(increments), 2), where [:, k, 0] holds the waiting times
+      for an increase by increments[k] and [:, k, 1] those for a decrease, with np.inf where the target is never reached.
+      It is a transposed view of a (2, len(increments), len(data)) array, so every [:, k, d] is contiguous in memory.
+
+    Raises:
+    - ValueError: if a price is NaN or infinite (see also quantize_prices when tick_size is given).
+    """
+    # The window table and the stack sweep both rely on the prices being totally ordered, which NaN breaks
+    if not np.all(np.isfinite(data)):
+        raise ValueError("prices must be finite; remove or fill NaN and infinite values first")
+    if tick_size is not None:
+        data, incs = quantize_prices(data, increments, tick_size)
+    else:
+        data = np.asarray(data, dtype=np.float64)
+        incs = np.asarray(increments, dtype=np.float64)
+    # The time index is the innermost axis, so the waiting times of one increment and direction are contiguous
+    waiting_times = np.empty((2, len(incs), len(data)), dtype=np.float32)
+
+    compiled_kernel = NUMBA_AVAILABLE or CYTHON_AVAILABLE
+    if compiled_kernel:
+        contiguous_data = np.ascontiguousarray(data)
+        contiguous_incs = np.ascontiguousarray(incs)
+        # The sign has the type of the prices, so the kernels are specialized for ticks or floats as a whole
+        for d, sign in enumerate((data.dtype.type(1), data.dtype.type(-1))):
+            waiting_times[d] = _waiting_times_dir(contiguous_data, contiguous_incs, sign)
+    else:
+        # The window table does not depend on the increment, so it is built once per direction
+        # The numpy path is limited by memory gathers, so it handles one increment at a time on the shared table
+        for d, direction in enumerate(("increase", "decrease")):
+            window_max = build_window_max_table(data, direction)
+            for k, increment in enumerate(incs):
+                waiting_times[d, k] = calculate_waiting_times_one_direction(data, increment, direction, window_max)
+
+    return waiting_times.transpose(2, 1, 0)
+
+
 # Generalized function to calculate waiting times for both increase and decrease
-def calculate_waiting_times_both_directions(data, increments):
+def calculate_waiting_times_both_directions(data, increments, tick_size=None):
     """
     Calculate waiting times for both increase and decrease for a list of increments.
 
     Parameters:
     - data: numpy array of prices.
     - increments: list of positive increments (e.g., [5, 10, 20]).
+    - tick_size: optional price resolution (e.g., 0.01). If given, prices and increments are compared as int32 tick counts.
 
     Returns:
     - A dictionary with keys as tuples (increment, direction) where direction is "increase" or "decrease",
-      and values are numpy arrays of waiting times.
+      and values are contiguous numpy arrays of waiting times (views into the array of calculate_waiting_times_array).
     """
+    waiting_times = calculate_waiting_times_array(data, increments, tick_size)
+
     results = {}
-    n = len(data)
+    for k, increment in enumerate(increments):
+        results[(increment, "increase")] = waiting_times[:, k, 0]
+        results[(increment, "decrease")] = waiting_times[:, k, 1]
 
-    for increment in increments:
-        # Calculate waiting times for increase
-        waiting_times_increase = []
-        for i in range(n):
-            target = data[i] + increment
-            condition = data[i:] >= target
-            if np.any(condition):
-                waiting_time = np.argmax(condition)
-            else:
-                waiting_time = np.inf
-            waiting_times_increase.append(waiting_time)
-        results[(increment, "increase")] = np.array(waiting_times_increase)
-
-        # Calculate waiting times for decrease
-        waiting_times_decrease = []
-        for i in range(n):
-            target = data[i] - increment
-            condition = data[i:] <= target
-            if np.any(condition):
-                waiting_time = np.argmax(condition)
-            else:
-                waiting_time = np.inf
-            waiting_times_decrease.append(waiting_time)
-        results[(increment, "decrease")] = np.array(waiting_times_decrease)
+    return results
+
+
+# Histograms of the waiting times, counted from the arrays that are already in memory
+def calculate_waiting_time_counts(waiting_times_dict):
+    """
+    Count how often each waiting time occurs, for every increment and direction.
+
+    Parameters:
+    - waiting_times_dict: output of calculate_waiting_times_both_directions.
+
+    Returns:
+    - A dictionary with the same keys as waiting_times_dict, and values as tuples (counts, never_reached):
+      counts[w] is the number of indices with a waiting time of w minutes, and never_reached is the number
+      of indices whose target price is never reached.
+    """
+    results = {}
+    for key, waiting_times in waiting_times_dict.items():
+        finite_times = waiting_times[np.isfinite(waiting_times)].astype(np.int64)
+        results[key] = (np.bincount(finite_times, minlength=1), len(waiting_times) - len(finite_times))
 
     return results
 
@@ -181,22 +445,27 @@ def calculate_waiting_times_both_directions(data, increments):
 #    - The `calculate_waiting_times_both_directions` function is called with:
 #      - `data`: The subset of gold price data.
 #      - `increments`: The list of increments.
+#      - `tick_size`: The price resolution, so that prices are compared as whole numbers of ticks.
 #    - The function computes the waiting times for both price increases and decreases for each specified increment.
 # 
+#    - The `calculate_waiting_time_counts` function is called on `waiting_times_dict` to count how often each waiting time occurs.
+# 
 # 4. **Store Results**:
 #    - The output is stored in the variable `waiting_times_dict`, which is a dictionary containing the waiting times for each increment and direction.
+#    - The counts are stored in `waiting_time_counts`, which is used by the histogram and PDF cells.
 # 
 # #### Notes:
 # - Ensure that the subset size (`125000`) is appropriate for the computational resources available.
-# - The `waiting_times_dict` can be used for further analysis or visualization in subsequent cells.
+# - The `waiting_times_dict` can be used for further analysis or visualization in subsequent cells. The bar plots over time use it directly, and the histograms and PDFs use the counts derived from it.
 # 
-# **Output**: A dictionary (`waiting_times_dict`) containing waiting times for the specified increments and directions.
+# **Output**: A dictionary (`waiting_times_dict`) containing waiting times for the specified increments and directions, and a dictionary (`waiting_time_counts`) with their counts.
 # 
 
 # %%
 data = prices[:125000]
 increments = [5, 10, 20]  # Example increments
-waiting_times_dict = calculate_waiting_times_both_directions(data, increments)
+waiting_times_dict = calculate_waiting_times_both_directions(data, increments, tick_size)
+waiting_time_counts = calculate_waiting_time_counts(waiting_times_dict)
 
 # %% [markdown]
 # ### Visualizing the Waiting Times for Each Increment and Direction
@@ -211,39 +480,51 @@ waiting_times_dict = calculate_waiting_times_both_directions(data, increments)
 #      - `waiting_times`: The array of computed waiting times for the respective increment and direction.
 # 
 # 2. **Clean the Data**:
-#    - Replace `infinity` values (`np.inf`) in the `waiting_times` array with `NaN` using `np.where`. This ensures that these values are excluded from the visualization.
+#    - Waiting times that are `infinity` (`np.inf`) are set to `0` with `np.isfinite`, so no bar is drawn for them.
+# 
+# 3. **Aggregate Into Blocks**:
+#    - Drawing one bar per time index would create one `Rectangle` per data point (125 000 of them), which makes rendering very slow.
+#    - The time indices are instead split into at most `max_bars` (2000) consecutive blocks, and `np.maximum.reduceat` keeps the largest waiting time within each block. At screen resolution this is the same outline as one bar per index.
 # 
-# 3. **Create Bar Plots**:
+# 4. **Create Bar Plots**:
 #    - A bar plot is generated for each combination of increment and direction:
 #      - The x-axis represents the time index (data points).
 #      - The y-axis represents the waiting time in minutes.
 #      - The title indicates the increment and direction being plotted (e.g., "Minimum Waiting Time for Increase by 10").
 # 
-# 4. **Customize the Plot**:
-#    - The bar width is set to `1.0` for clarity.
+# 5. **Customize the Plot**:
+#    - Each bar spans its block of time indices (`align='edge'`), so the bars still cover the x-axis without gaps.
 #    - The bars are styled with a sky-blue color.
 #    - Each plot includes labeled axes, a descriptive title, and appropriate scaling.
 # 
-# 5. **Display the Plots**:
-#    - Each plot is displayed using `plt.show()`.
+# 6. **Display the Plots**:
+#    - A single figure is created with `plt.subplots` before the loop. For each plot, its axes are cleared with `ax.clear()`, redrawn, and shown with `display(fig)`, instead of allocating a new figure every time.
+#    - The figure is closed with `plt.close(fig)` after the loop.
 # 
 # #### Notes:
-# - Large datasets may produce densely packed plots. Consider reducing the dataset size or adjusting the bar width for better visualization.
-# - The use of `NaN` ensures that bars for missing or infinite waiting times are omitted.
+# - Increase `max_bars` for more detail along the time axis, at the cost of slower rendering.
+# - Blocks in which the target is never reached have a height of `0`, so no bar is shown for them.
 # 
 # **Output**: Bar plots showing the minimum waiting times for price movements (increases and decreases) for each increment.
 # 
 
 # %%
 # Plot results for each increment and direction
+max_bars = 2000  # Maximum number of bars drawn per plot
+
+fig, ax = plt.subplots(figsize=(10, 6))  # One figure reused for every plot
 for (increment, direction), waiting_times in waiting_times_dict.items():
-    plt.figure(figsize=(10, 6))
-    cleaned_times = np.where(waiting_times == np.inf, np.nan, waiting_times)  # Replace inf with NaN for plotting
-    plt.bar(range(len(cleaned_times)), cleaned_times, width=1.0, color='skyblue')
-    plt.xlabel('Time Index')
-    plt.ylabel('Minimum Waiting Time (minutes)')
-    plt.title(f'Minimum Waiting Time for {direction.capitalize()} by {increment}')
-    plt.show()
+    ax.clear()
+    finite_times = np.where(np.isfinite(waiting_times), waiting_times, 0)  # No bar where the target is never reached
+    # Aggregate consecutive time indices into blocks and keep the longest waiting time of each block
+    block_edges = np.linspace(0, len(finite_times), min(max_bars, len(finite_times)) + 1).astype(int)
+    block_heights = np.maximum.reduceat(finite_times, block_edges[:-1])
+    ax.bar(block_edges[:-1], block_heights, width=np.diff(block_edges), align='edge', color='skyblue')
+    ax.set_xlabel('Time Index')
+    ax.set_ylabel('Minimum Waiting Time (minutes)')
+    ax.set_title(f'Minimum Waiting Time for {direction.capitalize()} by {increment}')
+    display(fig)
+plt.close(fig)
 
 # %% [markdown]
 # ### Plotting Histograms of Waiting Times for Each Increment and Direction
@@ -252,13 +533,15 @@ for (increment, direction), waiting_times in waiting_times_dict.items():
 # 
 # #### Steps:
 # 1. **Iterate Through Results**:
-#    - The `waiting_times_dict` dictionary is iterated over, with each key-value pair representing:
+#    - The `waiting_time_counts` dictionary is iterated over, with each key-value pair representing:
 #      - `increment`: The price increment (e.g., 5, 10, 20).
 #      - `direction`: The direction of price movement (`"increase"` or `"decrease"`).
-#      - `waiting_times`: The array of computed waiting times for the respective increment and direction.
+#      - `counts`: How many indices have each waiting time (in minutes) for the respective increment and direction.
+#      - `never_reached`: How many indices never reach their target price.
 # 
-# 2. **Clean the Data**:
-#    - Replace `infinity` values (`np.inf`) in the `waiting_times` array with `NaN` using `np.where`. This ensures that invalid values are excluded from the histogram.
+# 2. **Use the Counts as Weights**:
+#    - Only the waiting times that occur at least once are passed to `ax.hist`, each weighted by its count. This gives the same histogram as binning every individual waiting time, from far fewer values.
+#    - Waiting times that are `infinity` are not part of the counts, so they are excluded from the histogram.
 # 
 # 3. **Create Histograms**:
 #    - A histogram is plotted for each combination of increment and direction:
@@ -269,31 +552,34 @@ for (increment, direction), waiting_times in waiting_times_dict.items():
 # 
 # 4. **Customize the Plot**:
 #    - Each histogram is given:
-#      - A descriptive title indicating the increment and direction (e.g., "Minimum Waiting Time for Increase by 10").
+#      - A descriptive title indicating the increment and direction (e.g., "Minimum Waiting Time for Increase by 10"), followed by the number of targets that are never reached.
 #      - Labeled axes for clarity.
 #      - An alpha value (`0.7`) for slight transparency to enhance visual appeal.
 # 
 # 5. **Display the Histograms**:
-#    - Each histogram is displayed using `plt.show()`.
+#    - As in the previous cell, one figure is reused: its axes are cleared and redrawn for each histogram, which is shown with `display(fig)`. The figure is closed after the loop.
 # 
 # #### Notes:
 # - The high number of bins (`1000`) ensures detailed visualization but may need adjustment for datasets with fewer data points.
-# - The use of `NaN` excludes infinite waiting times from the histogram, ensuring accurate representation of the data.
+# - Excluding infinite waiting times ensures an accurate representation of the data. Their number is shown in the title instead, so it is visible how much of the data the histogram leaves out.
 # 
 # **Output**: Histograms showing the frequency distribution of waiting times for price movements (increases and decreases) for each increment.
 # 
 
 # %%
 # Plot histograms for each increment
-for (increment, direction), waiting_times in waiting_times_dict.items():
-    # Create a single figure with histograms for increase and decrease
-    plt.figure(figsize=(10, 6))
-    cleaned_times = np.where(waiting_times == np.inf, np.nan, waiting_times)  # Replace inf with NaN for plotting
-    plt.hist(cleaned_times, bins=1000, alpha=0.7, color='yellow')
-    plt.xlabel('Min Waiting Time (minutes)')
-    plt.ylabel('Frequency')
-    plt.title(f'Minimum Waiting Time for {direction.capitalize()} by {increment}')
-    plt.show()
+fig, ax = plt.subplots(figsize=(10, 6))  # One figure reused for every histogram
+for (increment, direction), (counts, never_reached) in waiting_time_counts.items():
+    ax.clear()
+    observed_waits = np.flatnonzero(counts)  # Waiting times that occur at least once
+    ax.hist(observed_waits, bins=1000, weights=counts[observed_waits], alpha=0.7, color='yellow')
+    ax.set_xlabel('Min Waiting Time (minutes)')
+    ax.set_ylabel('Frequency')
+    # Targets that are never reached have no waiting time to bin, so their number is reported in the title
+    ax.set_title(f'Minimum Waiting Time for {direction.capitalize()} by {increment}\n'
+                 f'({never_reached} of {counts.sum() + never_reached} targets never reached)')
+    display(fig)
+plt.close(fig)
 
 # %% [markdown]
 # ### Plotting Emperical Probability Density Functions (PDFs) of Waiting Times for Each Increment and Direction
@@ -302,70 +588,189 @@ for (increment, direction), waiting_times in waiting_times_dict.items():
 # 
 # #### Steps:
 # 1. **Iterate Through Increments**:
-#    - The code iterates through unique `increments` present in the `waiting_times_dict`, extracting the corresponding waiting times for both `"increase"` and `"decrease"` directions for each increment.
-#    - For each increment, the waiting times are fetched using the dictionary keys `(increment, "increase")` and `(increment, "decrease")`.
+#    - The code iterates through unique `increments` present in the `waiting_time_counts`, extracting the corresponding waiting time counts for both `"increase"` and `"decrease"` directions for each increment.
+#    - For each increment, the counts are fetched using the dictionary keys `(increment, "increase")` and `(increment, "decrease")`.
 # 
-# 2. **Clean the Data**:
-#    - The waiting times arrays for both directions are cleaned by removing `NaN` and `infinity` values using `np.isfinite`. This ensures that only valid waiting times are used in the subsequent analysis.
+# 2. **Valid Waiting Times Only**:
+#    - The counts only include finite waiting times, so `infinity` values are already excluded from the subsequent analysis.
 # 
-# 3. **Calculate Histograms and Normalize to PDFs**:
-#    - For both directions, histograms are calculated using `np.histogram`, with the `density=True` parameter to normalize the histogram into a probability density function (PDF).
-#    - The histograms are computed with 1000 bins for fine-grained results.
-#    - The bin edges are then used to calculate the bin centers for plotting purposes.
+# 3. **Estimate the PDFs**:
+#    - Waiting times are heavy-tailed: most are short, but a few are very long. A histogram with many bins is mostly empty or noisy, so the PDFs are estimated with a Gaussian kernel density estimate (`scipy.stats.gaussian_kde`) instead.
+#    - `log_kde_pdf` fits the estimate on `log10` of the waiting times, weighted by their counts, so that a single bandwidth suits both the short and the long waiting times. The density is converted back to minutes by dividing by `w * ln(10)`.
+#    - Both PDFs are evaluated on the same `num_kde_points` (200) logarithmically spaced waiting times (`np.logspace`), from the shortest to the longest waiting time observed in either direction, so they can be compared point by point.
+#    - A direction with fewer than two distinct waiting times is not plotted, since no density can be estimated from it. If this holds for both directions, the increment is skipped.
 # 
 # 4. **Plot the PDFs**:
-#    - The histograms for the `"increase"` and `"decrease"` directions are plotted as scatter plots.
-#    - The `increase` direction is represented by blue circles (`'o'`), while the `decrease` direction is represented by red crosses (`'x'`).
+#    - The PDFs for the `"increase"` and `"decrease"` directions are plotted as smooth curves, in blue and red respectively.
 #    - The areas under the curves are filled with semi-transparent colors (blue for increase, red for decrease) to improve visibility.
 # 
 # 5. **Customize the Plot**:
 #    - Labels are added to the x-axis and y-axis: "Waiting Time (minutes)" and "Probability Density," respectively.
+#    - Both axes use a logarithmic scale to match the logarithmic grid and show the tail of the distribution.
 #    - A title is dynamically generated based on the current increment (e.g., "Empirical PDFs of Waiting Times for Increment = 5").
 #    - A legend is added to distinguish between the `increase` and `decrease` directions.
 #    - A grid is applied for better readability, and the layout is adjusted to ensure everything fits within the plot.
 # 
 # 6. **Display the Plot**:
-#    - The plot is displayed using `plt.show()`, which renders the figure.
+#    - One figure is reused for every increment: its axes are cleared, redrawn, and rendered with `display(fig)`. The figure is closed with `plt.close(fig)` after the loop.
 # 
 # #### Notes:
-# - **Probability Density**: The histograms are normalized to form a probability density function (PDF), making it easier to compare the relative frequency of waiting times for both directions.
+# - **Probability Density**: The kernel density estimates are normalized over all positive waiting times, like a probability density function (PDF). The plot only shows the range of the observed waiting times, so the curves integrate to slightly less than one there, but they can still be compared directly between both directions.
 # - **Transparency**: The use of alpha transparency in the fill areas helps make the overlapping regions more visible.
 # - **Plot Customization**: Adjusting the plot's size and adding grid lines ensures that the visualization is clear and readable.
 # 
-# **Output**: A set of scatter plots showing the PDF of waiting times for both the `increase` and `decrease` directions, for each increment. The plots are color-coded for clarity and display the distribution of waiting times for better comparison.
+# **Output**: A set of plots showing the PDF of waiting times for both the `increase` and `decrease` directions, for each increment. The plots are color-coded for clarity and display the distribution of waiting times for better comparison.
 # 
 
 # %%
-for increment in set(key[0] for key in waiting_times_dict.keys()):
-        # Extract waiting times for "increase" and "decrease" directions for the current increment
-    waiting_times_increase = waiting_times_dict.get((increment, "increase"), np.array([]))
-    waiting_times_decrease = waiting_times_dict.get((increment, "decrease"), np.array([]))
+num_kde_points = 200  # Number of logarithmically spaced points at which each PDF is evaluated
 
 
-    # Remove inf and NaN values explicitly
-    cleaned_waiting_times_increase = waiting_times_increase[np.isfinite(waiting_times_increase)]
-    cleaned_waiting_times_decrease = waiting_times_decrease[np.isfinite(waiting_times_decrease)]
+def log_kde_pdf(counts, waits):
+    """
+    Kernel density estimate of the waiting time PDF, fitted on the logarithm of the waiting times.
 
-    # Calculate histogram bins and normalize to obtain PDF
-    # "density=True" ensures the histogram is normalized to form a probability density function
-    hist_increase, bin_edges = np.histogram(cleaned_waiting_times_increase, bins=1000, density=True)
-    hist_decrease, _ = np.histogram(cleaned_waiting_times_decrease, bins=1000, density=True)
-    bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
+    Parameters:
+    - counts: numpy array where counts[w] is the number of waiting times of w minutes.
+    - waits: numpy array of waiting times (in minutes) at which the PDF is evaluated.
 
-    # Plot the PDFs using scatter plots for better visualization
-    plt.figure(figsize=(10, 6))
-    plt.scatter(bin_centers, hist_increase, color='blue', linewidth=2, marker='o', label='Increase', alpha=0.7)
-    plt.scatter(bin_centers, hist_decrease, color='red', linewidth=2, marker='x', label='Decrease', alpha=0.7)
-    plt.fill_between(bin_centers, hist_increase, color='blue', alpha=0.3)
-    plt.fill_between(bin_centers, hist_decrease, color='red', alpha=0.3)
+    Returns:
+    - A numpy array with the estimated probability density at each of the given waiting times,
+      or None if fewer than two distinct waiting times were observed.
+    """
+    observed_waits = np.flatnonzero(counts)
+    if len(observed_waits) < 2:
+        return None
+    kde = gaussian_kde(np.log10(observed_waits), weights=counts[observed_waits])
+    # Change of variables from log10(w) back to w
+    return kde(np.log10(waits)) / (waits * np.log(10))
+
+
+fig, ax = plt.subplots(figsize=(10, 6))  # One figure reused for every increment
+for increment in set(key[0] for key in waiting_time_counts.keys()):
+    # Extract the waiting time counts for "increase" and "decrease" directions for the current increment
+    # Infinite waiting times are not part of the counts
+    counts_increase, _ = waiting_time_counts.get((increment, "increase"), (np.zeros(0, dtype=np.int64), 0))
+    counts_decrease, _ = waiting_time_counts.get((increment, "decrease"), (np.zeros(0, dtype=np.int64), 0))
+
+    # Evaluate both PDFs on the same log-spaced grid, spanning the observed waiting times of both directions
+    observed_waits = np.concatenate([np.flatnonzero(counts_increase), np.flatnonzero(counts_decrease)])
+    if len(observed_waits) == 0:
+        continue  # No finite waiting time for this increment
+    waits = np.logspace(np.log10(observed_waits.min()), np.log10(observed_waits.max()), num_kde_points)
+    pdf_increase = log_kde_pdf(counts_increase, waits)
+    pdf_decrease = log_kde_pdf(counts_decrease, waits)
+    if pdf_increase is None and pdf_decrease is None:
+        continue  # Too few distinct waiting times in both directions to estimate a density
+
+    # Plot the PDFs as smooth curves
+    ax.clear()
+    for pdf, color, label in ((pdf_increase, 'blue', 'Increase'), (pdf_decrease, 'red', 'Decrease')):
+        if pdf is not None:
+            ax.plot(waits, pdf, color=color, linewidth=2, label=label, alpha=0.7)
+            ax.fill_between(waits, pdf, color=color, alpha=0.3)
 
     # Add labels, title, and legend to the plot for clarity
-    plt.xlabel('Waiting Time (minutes)', fontsize=14)
-    plt.ylabel('Probability Density', fontsize=14)
-    plt.title(f'Empirical PDFs of Waiting Times for Increment = {increment}', fontsize=16)
-    plt.legend(fontsize=12)
-    plt.grid(alpha=0.3)
-    plt.tight_layout()
-    plt.show()
+    ax.set_xlabel('Waiting Time (minutes)', fontsize=14)
+    ax.set_ylabel('Probability Density', fontsize=14)
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+    ax.set_title(f'Empirical PDFs of Waiting Times for Increment = {increment}', fontsize=16)
+    ax.legend(fontsize=12)
+    ax.grid(alpha=0.3)
+    fig.tight_layout()
+    display(fig)
+plt.close(fig)
+
+# %% [markdown]
+# ### Online Waiting Times for Streaming Prices
+# 
+# This cell defines a tracker that computes waiting times incrementally, as new 1-minute prices arrive, instead of reprocessing the whole history for every update.
+# 
+# #### Class Definition: `WaitingTimeTracker`
+# - **Purpose**:
+#   Keep track of the past time indices whose target price has not been reached yet, and resolve them as soon as a new price reaches their target.
+# 
+# - **Parameters**:
+#   1. `increment`: A positive price increment (e.g., `10`).
+#   2. `direction`: `"increase"` (default) or `"decrease"`.
+# 
+# - **Methods**:
+#   - `push(price, t=None)`: Adds the price observed at time index `t` (by default, the index following the previous push). Returns a list of `(i, waiting_time)` pairs for every earlier index `i` whose target is reached by this price.
+#   - `unresolved()`: Returns the time indices whose target has not been reached so far. At the end of the stream, their waiting time is `infinity`.
+# 
+# #### Logic:
+# 1. **Pending Targets**:
+#    - Every pushed price becomes pending with its own target price (the price plus the increment, or minus it for a decrease).
+#    - Pending entries are kept in a min-heap (`heapq`) ordered by target, so the entries that a new price can resolve are always at the top.
+# 
+# 2. **Resolving**:
+#    - When a new price arrives, entries are popped from the heap while their target is reached, and each one is emitted with its waiting time `t - i`.
+#    - Every index is pushed and popped once, so each update costs `O(log P)` amortized, where `P` is the number of pending indices, instead of a full `O(N)` recomputation.
+# 
+# 3. **Consistency Check**:
+#    - The example replays `data` through a tracker for an increment of `10` and compares the streamed waiting times with `waiting_times_dict[(10, "increase")]`.
+#    - The prices and the increment are first converted to ticks with `quantize_prices`, so the tracker compares the same integers as the batch computation.
+# 
+# **Output**: The `WaitingTimeTracker` class, and a check that the streamed waiting times match the batch computation.
+
+# %%
+class WaitingTimeTracker:
+    """
+    Incrementally resolve waiting times for a single increment and direction as prices arrive.
+
+    Parameters:
+    - increment: positive price increment (e.g., 10).
+    - direction: "increase" or "decrease".
+    """
+
+    def __init__(self, increment, direction="increase"):
+        self.increment = increment
+        self.direction = direction
+        self._sign = 1.0 if direction == "increase" else -1.0
+        self._pending = []  # Heap of (signed target price, time index)
+        self._next_t = 0
+
+    def push(self, price, t=None):
+        """
+        Add a new price and resolve every pending index whose target it reaches.
+
+        Parameters:
+        - price: the newly observed price.
+        - t: time index of the price (defaults to one after the previous push).
+
+        Returns:
+        - A list of (i, waiting_time) tuples for the indices resolved by this price.
+        """
+        if t is None:
+            t = self._next_t
+        self._next_t = t + 1
+
+        resolved = []
+        signed_price = self._sign * price
+        while self._pending and self._pending[0][0] <= signed_price:
+            _, i = heapq.heappop(self._pending)
+            resolved.append((i, t - i))
+
+        target = self._sign * (price + self._sign * self.increment)
+        heapq.heappush(self._pending, (target, t))
+        return resolved
+
+    def unresolved(self):
+        """
+        Return the sorted time indices whose target price has not been reached yet.
+        """
+        return sorted(i for _, i in self._pending)
+
 
+# Replay the prices through the tracker and compare with the batch computation
+# The tracker is fed the same tick counts as the batch computation
+ticks, (increment_ticks,) = quantize_prices(data, [10], tick_size)
+tracker = WaitingTimeTracker(int(increment_ticks), "increase")
+streamed_waiting_times = np.full(len(data), np.inf, dtype=np.float32)
+for t, price in enumerate(ticks.tolist()):
+    for i, waiting_time in tracker.push(price, t):
+        streamed_waiting_times[i] = waiting_time
 
+print("Streamed waiting times match the batch computation:",
+      np.array_equal(streamed_waiting_times, waiting_times_dict[(10, "increase")]))
@@ -0,0 +1,73 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, initializedcheck=False
+"""
+Cython port of the compiled waiting time kernel used by Inverse_Statistic.
+
+This module is loaded through `pyximport` when Numba is not installed. It implements the
+same monotonic-stack sweep as the Numba kernel (a binary search on the stack of upcoming
+strict records for every index) as plain C loops over typed memoryviews.
+Every function is specialized for int32 tick counts and float64 prices; the prices, increments
+and sign passed to one call must share the same type.
+"""
+import numpy as np
+
+from libc.math cimport INFINITY
+
+
+ctypedef fused price_t:
+    int
+    double
+
+
+cdef void _wt(const price_t[::1] data, const price_t[::1] incs, price_t sign, float[:, ::1] out,
+              price_t[::1] stack_prices, Py_ssize_t[::1] stack_indices) noexcept nogil:
+    cdef Py_ssize_t n = data.shape[0]
+    cdef Py_ssize_t num_incs = incs.shape[0]
+    cdef Py_ssize_t i, k, top, lo, hi, mid
+    cdef price_t target, price
+
+    for k in range(num_incs):
+        top = 0
+        for i in range(n - 1, -1, -1):
+            # The stack holds the strict records after i, nearest on top, so the (signed) prices rise towards the bottom
+            # Binary search for the entry closest to the top that reaches the target price
+            target = sign * (data[i] + sign * incs[k])
+            lo = 0
+            hi = top
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if stack_prices[mid] >= target:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            out[k, i] = <float>(stack_indices[lo - 1] - i) if lo > 0 else INFINITY
+
+            price = sign * data[i]
+            while top > 0 and stack_prices[top - 1] <= price:
+                top -= 1
+            stack_prices[top] = price
+            stack_indices[top] = i
+            top += 1
+
+
+def waiting_times_dir(const price_t[::1] data, const price_t[::1] incs, price_t sign):
+    """
+    Waiting times for a single direction and several increments.
+
+    Parameters:
+    - data: contiguous int32 (tick counts) or float64 numpy array of prices.
+    - incs: contiguous numpy array of the same dtype as data holding positive price increments.
+    - sign: 1 for "increase", -1 for "decrease", of the same type as data.
+
+    Returns:
+    - A float32 numpy array of shape (len(incs), len(data)) of waiting times,
+      with np.inf where the target price is never reached.
+    """
+    out = np.empty((incs.shape[0], data.shape[0]), dtype=np.float32)
+    stack_prices = np.empty(data.shape[0], dtype=np.asarray(data).dtype)
+    stack_indices = np.empty(data.shape[0], dtype=np.intp)
+    cdef float[:, ::1] out_view = out
+    cdef price_t[::1] stack_view = stack_prices
+    cdef Py_ssize_t[::1] stack_indices_view = stack_indices
+    with nogil:
+        _wt(data, incs, sign, out_view, stack_view, stack_indices_view)
+    return out